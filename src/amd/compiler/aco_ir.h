@@ -966,14 +966,20 @@ void aco_print_program(Program *program, FILE *output);
 
 typedef struct {
    const int16_t opcode_gfx9[static_cast<int>(aco_opcode::num_opcodes)];
-   const std::bitset<static_cast<int>(aco_opcode::num_opcodes)> can_use_input_modifiers;
-   const std::bitset<static_cast<int>(aco_opcode::num_opcodes)> can_use_output_modifiers;
-   const char *name[static_cast<int>(aco_opcode::num_opcodes)];
+   const BITSET_DECLARE(can_use_input_modifiers, static_cast<int>(aco_opcode::num_opcodes));
+   const BITSET_DECLARE(can_use_output_modifiers, static_cast<int>(aco_opcode::num_opcodes));
+   const char *name_data;
+   const uint16_t name_offset[static_cast<int>(aco_opcode::num_opcodes)];
    const aco::Format format[static_cast<int>(aco_opcode::num_opcodes)];
 } Info;
 
 extern const Info instr_info;
 
+static inline const char *opcode_name(aco_opcode opcode)
+{
+   return instr_info.name_data + instr_info.name_offset[(int)opcode];
+}
+
 }
 
 #endif /* ACO_IR_H */
@@ -1440,3 +1440,7 @@ FLAT = [
 ]
 for code, name in FLAT:
     opcode(name, code, Format.FLAT)
+
+# Opcode names in the order of the aco_opcode enum, which the tables in
+# aco_opcodes.cpp are indexed by.
+opcode_names = sorted(opcodes.keys())
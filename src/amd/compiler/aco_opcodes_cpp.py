@@ -1,5 +1,17 @@
 
-template = """\
+import sys
+
+from mako.runtime import Context
+from mako.template import Template
+
+from aco_opcodes import opcodes, opcode_names, Format, VOPC_GFX6
+
+# must match BITSET_WORDBITS in util/bitset.h
+BITSET_WORDBITS = 32
+
+# Written out verbatim in front of the template output, so Mako does not
+# have to parse it.
+_COPYRIGHT = """\
 /* 
  * Copyright (c) 2018 Valve Corporation
  *
@@ -24,46 +36,86 @@ template = """\
  *
  */
 
+"""
+
+_TEMPLATE = Template("""\
 #include "aco_ir.h"
 
 namespace aco {
 
 const unsigned VOPC_to_GFX6[256] = {
-% for code in VOPC_GFX6:
-    ${code},
-% endfor
+    ${vopc_to_gfx6},
 };
 
-<%
-opcode_names = sorted(opcodes.keys())
-can_use_input_modifiers = "".join([opcodes[name].input_mod for name in reversed(opcode_names)])
-can_use_output_modifiers = "".join([opcodes[name].output_mod for name in reversed(opcode_names)])
-%>
+/* All opcode names, each NUL-terminated, indexed by instr_info.name_offset */
+static const char name_data[] =
+   ${name_data};
 
 extern const aco::Info instr_info = {
    .opcode_gfx9 = {
-      % for name in opcode_names:
-      ${opcodes[name].opcode_gfx9},
-      % endfor
+      ${opcode_gfx9},
+   },
+   .can_use_input_modifiers = {
+      ${can_use_input_modifiers},
+   },
+   .can_use_output_modifiers = {
+      ${can_use_output_modifiers},
    },
-   .can_use_input_modifiers = std::bitset<${len(opcode_names)}>("${can_use_input_modifiers}"),
-   .can_use_output_modifiers = std::bitset<${len(opcode_names)}>("${can_use_output_modifiers}"),
-   .name = {
-      % for name in opcode_names:
-      "${name}",
-      % endfor
+   .name_data = name_data,
+   .name_offset = {
+      ${name_offsets},
    },
    .format = {
-      % for name in opcode_names:
-      aco::Format::${str(opcodes[name].format.name)},
-      % endfor
+      ${formats},
    },
 };
 
 }
-"""
+""")
 
-from aco_opcodes import opcodes, VOPC_GFX6
-from mako.template import Template
+# Walk the sorted opcodes once, collecting the entries of every table.
+# The modifier flags are packed into BITSET_WORDs, so that the tables are
+# plain constant data instead of strings parsed by std::bitset at startup.
+format_names = {format: "aco::Format::" + format.name for format in Format}
+num_words = (len(opcode_names) + BITSET_WORDBITS - 1) // BITSET_WORDBITS
+opcode_gfx9 = []
+name_data = []
+name_offsets = []
+name_size = 0
+formats = []
+input_mods = [0] * num_words
+output_mods = [0] * num_words
+for i, name in enumerate(opcode_names):
+   op = opcodes[name]
+   opcode_gfx9.append(str(op.opcode_gfx9))
+   name_data.append('"%s\\0"' % name)
+   name_offsets.append(str(name_size))
+   name_size += len(name) + 1
+   formats.append(format_names[op.format])
+   word, bit = divmod(i, BITSET_WORDBITS)
+   if op.input_mod == "1":
+      input_mods[word] |= 1 << bit
+   if op.output_mod == "1":
+      output_mods[word] |= 1 << bit
+
+opcode_gfx9 = ",\n      ".join(opcode_gfx9)
+# name_offset is a uint16_t array
+assert name_size <= 0x10000
+name_data = "\n   ".join(name_data)
+name_offsets = ",\n      ".join(name_offsets)
+formats = ",\n      ".join(formats)
+can_use_input_modifiers = ",\n      ".join(["0x%08x" % w for w in input_mods])
+can_use_output_modifiers = ",\n      ".join(["0x%08x" % w for w in output_mods])
+vopc_to_gfx6 = ",\n    ".join([str(code) for code in VOPC_GFX6])
 
-print(Template(template).render(opcodes=opcodes, VOPC_GFX6=VOPC_GFX6))
+# Render straight into stdout rather than building the whole file as one
+# string first.
+sys.stdout.write(_COPYRIGHT)
+_TEMPLATE.render_context(Context(sys.stdout,
+                                 vopc_to_gfx6=vopc_to_gfx6,
+                                 opcode_gfx9=opcode_gfx9,
+                                 name_data=name_data,
+                                 name_offsets=name_offsets,
+                                 formats=formats,
+                                 can_use_input_modifiers=can_use_input_modifiers,
+                                 can_use_output_modifiers=can_use_output_modifiers))
@@ -29,8 +29,6 @@ template = """\
 #ifndef _ACO_OPCODES_
 #define _ACO_OPCODES_
 
-<% opcode_names = sorted(opcodes.keys()) %>
-
 enum class aco_opcode : std::uint16_t {
 % for name in opcode_names:
    ${name},
@@ -41,7 +39,7 @@ enum class aco_opcode : std::uint16_t {
 
 #endif /* _ACO_OPCODES_ */"""
 
-from aco_opcodes import opcodes
+from aco_opcodes import opcode_names
 from mako.template import Template
 
-print(Template(template).render(opcodes=opcodes))
+print(Template(template).render(opcode_names=opcode_names))
@@ -25,6 +25,11 @@
 
 import re
 
+try:
+   from sys import intern
+except ImportError:
+   pass # intern() is a builtin on Python 2
+
 # Class that represents all the information we have about the opcode
 # NOTE: this must be kept in sync with nir_op_info
 
@@ -32,13 +37,17 @@ class Opcode(object):
    """Class that represents all the information we have about the opcode
    NOTE: this must be kept in sync with nir_op_info
    """
+   __slots__ = ('name', 'num_inputs', 'output_size', 'output_type',
+                'input_sizes', 'input_types', 'is_conversion',
+                'algebraic_properties', 'const_expr')
+
    def __init__(self, name, output_size, output_type, input_sizes,
                 input_types, is_conversion, algebraic_properties, const_expr):
       """Parameters:
 
       - name is the name of the opcode (prepend nir_op_ for the enum name)
       - all types are strings that get nir_type_ prepended to them
-      - input_types is a list of types
+      - input_sizes is a tuple of sizes and input_types a tuple of types
       - is_conversion is true if this opcode represents a type conversion
       - algebraic_properties is a space-seperated string, where nir_op_is_ is
         prepended before each entry
@@ -67,28 +76,30 @@ class Opcode(object):
       assert isinstance(name, str)
       assert isinstance(output_size, int)
       assert isinstance(output_type, str)
-      assert isinstance(input_sizes, list)
+      assert isinstance(input_sizes, tuple)
       assert isinstance(input_sizes[0], int)
-      assert isinstance(input_types, list)
+      assert isinstance(input_types, tuple)
       assert isinstance(input_types[0], str)
       assert isinstance(is_conversion, bool)
       assert isinstance(algebraic_properties, str)
       assert isinstance(const_expr, str)
       assert len(input_sizes) == len(input_types)
       assert 0 <= output_size <= 4
-      for size in input_sizes:
-         assert 0 <= size <= 4
-         if output_size != 0:
-            assert size != 0
-      self.name = name
+      # Written as plain asserts rather than a loop over input_sizes, so
+      # that none of the checking survives python -O.
+      assert 0 <= min(input_sizes) and max(input_sizes) <= 4
+      assert output_size == 0 or 0 not in input_sizes
+      # Many opcodes share types, properties and const_exprs (fddx*, fnoise*,
+      # the comparisons, ...), so intern the strings to store one copy each.
+      self.name = intern(name)
       self.num_inputs = len(input_sizes)
       self.output_size = output_size
-      self.output_type = output_type
+      self.output_type = intern(output_type)
       self.input_sizes = input_sizes
-      self.input_types = input_types
+      self.input_types = tuple(intern(type_) for type_ in input_types)
       self.is_conversion = is_conversion
-      self.algebraic_properties = algebraic_properties
-      self.const_expr = const_expr
+      self.algebraic_properties = intern(algebraic_properties)
+      self.const_expr = intern(const_expr)
 
 # helper variables for strings
 tfloat = "float"
@@ -106,33 +117,47 @@ tuint64 = "uint64"
 tfloat64 = "float64"
 
 _TYPE_SPLIT_RE = re.compile(r'(?P<type>int|uint|float|bool)(?P<bits>\d+)?')
+_TYPE_SPLIT_MATCH = _TYPE_SPLIT_RE.match
+
+# The type helpers below are called for every opcode by all of the
+# generators, but only see a handful of distinct type strings.  Split each
+# one with the regex once and remember the result.
+_TYPE_SPLIT_CACHE = {}
+
+def _type_split(type_):
+    split = _TYPE_SPLIT_CACHE.get(type_)
+    if split is None:
+        m = _TYPE_SPLIT_MATCH(type_)
+        assert m is not None, 'Invalid NIR type string: "{}"'.format(type_)
+        bits = m.group('bits')
+        split = (m.group('type'), int(bits) if bits is not None else None)
+        _TYPE_SPLIT_CACHE[type_] = split
+    return split
 
 def type_has_size(type_):
-    m = _TYPE_SPLIT_RE.match(type_)
-    assert m is not None, 'Invalid NIR type string: "{}"'.format(type_)
-    return m.group('bits') is not None
+    return _type_split(type_)[1] is not None
 
 def type_size(type_):
-    m = _TYPE_SPLIT_RE.match(type_)
-    assert m is not None, 'Invalid NIR type string: "{}"'.format(type_)
-    assert m.group('bits') is not None, \
+    bits = _type_split(type_)[1]
+    assert bits is not None, \
            'NIR type string has no bit size: "{}"'.format(type_)
-    return int(m.group('bits'))
+    return bits
+
+_BASE_TYPE_SIZES = {
+    'bool': (1, 32),
+    'float': (16, 32, 64),
+    'int': (1, 8, 16, 32, 64),
+    'uint': (1, 8, 16, 32, 64),
+}
 
 def type_sizes(type_):
-    if type_has_size(type_):
-        return [type_size(type_)]
-    elif type_ == 'bool':
-        return [1, 32]
-    elif type_ == 'float':
-        return [16, 32, 64]
-    else:
-        return [1, 8, 16, 32, 64]
+    base_type, bits = _type_split(type_)
+    if bits is not None:
+        return [bits]
+    return list(_BASE_TYPE_SIZES[base_type])
 
 def type_base_type(type_):
-    m = _TYPE_SPLIT_RE.match(type_)
-    assert m is not None, 'Invalid NIR type string: "{}"'.format(type_)
-    return m.group('type')
+    return _type_split(type_)[0]
 
 # Operation where the first two sources are commutative.
 #
@@ -153,37 +178,46 @@ def opcode(name, output_size, output_type, input_sizes, input_types,
                           const_expr)
 
 def unop_convert(name, out_type, in_type, const_expr):
-   opcode(name, 0, out_type, [0], [in_type], False, "", const_expr)
+   opcode(name, 0, out_type, (0,), (in_type,), False, "", const_expr)
 
 def unop(name, ty, const_expr):
-   opcode(name, 0, ty, [0], [ty], False, "", const_expr)
+   opcode(name, 0, ty, (0,), (ty,), False, "", const_expr)
 
 def unop_horiz(name, output_size, output_type, input_size, input_type,
                const_expr):
-   opcode(name, output_size, output_type, [input_size], [input_type],
+   opcode(name, output_size, output_type, (input_size,), (input_type,),
           False, "", const_expr)
 
+def _reduce_exprs(srcs, reduce_expr, final_expr):
+   """Returns (size, const_expr) for the 2, 3 and 4 component variants of a
+   reduction over the prereduced per-component expressions srcs.  The 4
+   component variant reduces the pairs (x, y) and (z, w) first.
+   """
+   reduce_ = reduce_expr.format
+   final = final_expr.replace("{src}", "({src})").format
+   reduce01 = reduce_(src0=srcs[0], src1=srcs[1])
+   reduced = (reduce01,
+              reduce_(src0=reduce01, src1=srcs[2]),
+              reduce_(src0=reduce01, src1=reduce_(src0=srcs[2], src1=srcs[3])))
+   return [(size, final(src=expr))
+           for size, expr in zip((2, 3, 4), reduced)]
+
 def unop_reduce(name, output_size, output_type, input_type, prereduce_expr,
                 reduce_expr, final_expr):
-   def prereduce(src):
-      return "(" + prereduce_expr.format(src=src) + ")"
-   def final(src):
-      return final_expr.format(src="(" + src + ")")
-   def reduce_(src0, src1):
-      return reduce_expr.format(src0=src0, src1=src1)
-   src0 = prereduce("src0.x")
-   src1 = prereduce("src0.y")
-   src2 = prereduce("src0.z")
-   src3 = prereduce("src0.w")
-   unop_horiz(name + "2", output_size, output_type, 2, input_type,
-              final(reduce_(src0, src1)))
-   unop_horiz(name + "3", output_size, output_type, 3, input_type,
-              final(reduce_(reduce_(src0, src1), src2)))
-   unop_horiz(name + "4", output_size, output_type, 4, input_type,
-              final(reduce_(reduce_(src0, src1), reduce_(src2, src3))))
+   prereduce = ("(" + prereduce_expr + ")").format
+   srcs = [prereduce(src="src0." + c) for c in "xyzw"]
+   for size, const_expr in _reduce_exprs(srcs, reduce_expr, final_expr):
+      unop_horiz(name + str(size), output_size, output_type, size, input_type,
+                 const_expr)
 
 def unop_numeric_convert(name, out_type, in_type, const_expr):
-   opcode(name, 0, out_type, [0], [in_type], True, "", const_expr)
+   opcode(name, 0, out_type, (0,), (in_type,), True, "", const_expr)
+
+# Calls the double precision function for 64-bit sources and the float
+# variant with the "f" suffix otherwise.  bit_size is a constant in each case
+# of the generated switch, so the C compiler drops the untaken arm.
+def _float_call(func, src="src0"):
+   return "bit_size == 64 ? {0}({1}) : {0}f({1})".format(func, src)
 
 unop("mov", tuint, "src0")
 
@@ -202,7 +236,7 @@ unop("fsat", tfloat, ("bit_size == 64 ? " +
 unop("frcp", tfloat, "bit_size == 64 ? 1.0 / src0 : 1.0f / src0")
 unop("urcp", tuint32, "(uint32_t)(1 / (float)src0 * 4294967296.0)")
 unop("frsq", tfloat, "bit_size == 64 ? 1.0 / sqrt(src0) : 1.0f / sqrtf(src0)")
-unop("fsqrt", tfloat, "bit_size == 64 ? sqrt(src0) : sqrtf(src0)")
+unop("fsqrt", tfloat, _float_call("sqrt"))
 unop("fexp2", tfloat, "exp2f(src0)")
 unop("flog2", tfloat, "log2f(src0)")
 
@@ -234,19 +268,19 @@ for src_t in [tint, tuint, tfloat, tbool]:
 # Unary floating-point rounding operations.
 
 
-unop("ftrunc", tfloat, "bit_size == 64 ? trunc(src0) : truncf(src0)")
-unop("fceil", tfloat, "bit_size == 64 ? ceil(src0) : ceilf(src0)")
-unop("ffloor", tfloat, "bit_size == 64 ? floor(src0) : floorf(src0)")
-unop("ffract", tfloat, "src0 - (bit_size == 64 ? floor(src0) : floorf(src0))")
-unop("fround_even", tfloat, "bit_size == 64 ? _mesa_roundeven(src0) : _mesa_roundevenf(src0)")
+unop("ftrunc", tfloat, _float_call("trunc"))
+unop("fceil", tfloat, _float_call("ceil"))
+unop("ffloor", tfloat, _float_call("floor"))
+unop("ffract", tfloat, "src0 - (" + _float_call("floor") + ")")
+unop("fround_even", tfloat, _float_call("_mesa_roundeven"))
 
 unop("fquantize2f16", tfloat, "(fabs(src0) < ldexpf(1.0, -14)) ? copysignf(0.0f, src0) : _mesa_half_to_float(_mesa_float_to_half(src0))")
 
 # Trigonometric operations.
 
 
-unop("fsin", tfloat, "bit_size == 64 ? sin(src0) : sinf(src0)")
-unop("fcos", tfloat, "bit_size == 64 ? cos(src0) : cosf(src0)")
+unop("fsin", tfloat, _float_call("sin"))
+unop("fcos", tfloat, _float_call("cos"))
 
 # dfrexp
 unop_convert("frexp_exp", tint32, tfloat, "frexp(src0, &dst);")
@@ -267,31 +301,31 @@ unop("fddy_coarse", tfloat, "0.0")
 
 def pack_2x16(fmt):
    unop_horiz("pack_" + fmt + "_2x16", 1, tuint32, 2, tfloat32, """
-dst.x = (uint32_t) pack_fmt_1x16(src0.x);
-dst.x |= ((uint32_t) pack_fmt_1x16(src0.y)) << 16;
-""".replace("fmt", fmt))
+dst.x = (uint32_t) pack_{fmt}_1x16(src0.x);
+dst.x |= ((uint32_t) pack_{fmt}_1x16(src0.y)) << 16;
+""".format(fmt=fmt))
 
 def pack_4x8(fmt):
    unop_horiz("pack_" + fmt + "_4x8", 1, tuint32, 4, tfloat32, """
-dst.x = (uint32_t) pack_fmt_1x8(src0.x);
-dst.x |= ((uint32_t) pack_fmt_1x8(src0.y)) << 8;
-dst.x |= ((uint32_t) pack_fmt_1x8(src0.z)) << 16;
-dst.x |= ((uint32_t) pack_fmt_1x8(src0.w)) << 24;
-""".replace("fmt", fmt))
+dst.x = (uint32_t) pack_{fmt}_1x8(src0.x);
+dst.x |= ((uint32_t) pack_{fmt}_1x8(src0.y)) << 8;
+dst.x |= ((uint32_t) pack_{fmt}_1x8(src0.z)) << 16;
+dst.x |= ((uint32_t) pack_{fmt}_1x8(src0.w)) << 24;
+""".format(fmt=fmt))
 
 def unpack_2x16(fmt):
    unop_horiz("unpack_" + fmt + "_2x16", 2, tfloat32, 1, tuint32, """
-dst.x = unpack_fmt_1x16((uint16_t)(src0.x & 0xffff));
-dst.y = unpack_fmt_1x16((uint16_t)(src0.x << 16));
-""".replace("fmt", fmt))
+dst.x = unpack_{fmt}_1x16((uint16_t)(src0.x & 0xffff));
+dst.y = unpack_{fmt}_1x16((uint16_t)(src0.x << 16));
+""".format(fmt=fmt))
 
 def unpack_4x8(fmt):
    unop_horiz("unpack_" + fmt + "_4x8", 4, tfloat32, 1, tuint32, """
-dst.x = unpack_fmt_1x8((uint8_t)(src0.x & 0xff));
-dst.y = unpack_fmt_1x8((uint8_t)((src0.x >> 8) & 0xff));
-dst.z = unpack_fmt_1x8((uint8_t)((src0.x >> 16) & 0xff));
-dst.w = unpack_fmt_1x8((uint8_t)(src0.x >> 24));
-""".replace("fmt", fmt))
+dst.x = unpack_{fmt}_1x8((uint8_t)(src0.x & 0xff));
+dst.y = unpack_{fmt}_1x8((uint8_t)((src0.x >> 8) & 0xff));
+dst.z = unpack_{fmt}_1x8((uint8_t)((src0.x >> 16) & 0xff));
+dst.w = unpack_{fmt}_1x8((uint8_t)(src0.x >> 24));
+""".format(fmt=fmt))
 
 
 pack_2x16("snorm")
@@ -329,7 +363,7 @@ unop_horiz("unpack_64_2x32", 2, tuint32, 1, tuint64,
            "dst.x = src0.x; dst.y = src0.x >> 32;")
 
 unop_horiz("unpack_64_4x16", 4, tuint16, 1, tuint64,
-           "dst.x = src0.x; dst.y = src0.x >> 16; dst.z = src0.x >> 32; dst.w = src0.w >> 48;")
+           "dst.x = src0.x; dst.y = src0.x >> 16; dst.z = src0.x >> 32; dst.w = src0.x >> 48;")
 
 unop_horiz("unpack_32_2x16", 2, tuint16, 1, tuint32,
            "dst.x = src0.x; dst.y = src0.x >> 16;")
@@ -351,53 +385,17 @@ unop_convert("unpack_64_2x32_split_y", tuint32, tuint64, "src0 >> 32")
 # Bit operations, part of ARB_gpu_shader5.
 
 
-unop("bitfield_reverse", tuint32, """
-/* we're not winning any awards for speed here, but that's ok */
-dst = 0;
-for (unsigned bit = 0; bit < 32; bit++)
-   dst |= ((src0 >> bit) & 1) << (31 - bit);
-""")
-unop_convert("bit_count", tuint32, tuint, """
-dst = 0;
-for (unsigned bit = 0; bit < bit_size; bit++) {
-   if ((src0 >> bit) & 1)
-      dst++;
-}
-""")
+unop("bitfield_reverse", tuint32, "util_bitreverse(src0)")
+unop_convert("bit_count", tuint32, tuint,
+             "bit_size == 64 ? util_bitcount64(src0) : util_bitcount(src0)")
 
-unop_convert("ufind_msb", tint32, tuint, """
-dst = -1;
-for (int bit = bit_size - 1; bit >= 0; bit--) {
-   if ((src0 >> bit) & 1) {
-      dst = bit;
-      break;
-   }
-}
-""")
+unop_convert("ufind_msb", tint32, tuint, "(int)util_last_bit64(src0) - 1")
 
-unop("ifind_msb", tint32, """
-dst = -1;
-for (int bit = 31; bit >= 0; bit--) {
-   /* If src0 < 0, we're looking for the first 0 bit.
-    * if src0 >= 0, we're looking for the first 1 bit.
-    */
-   if ((((src0 >> bit) & 1) && (src0 >= 0)) ||
-      (!((src0 >> bit) & 1) && (src0 < 0))) {
-      dst = bit;
-      break;
-   }
-}
-""")
+# If src0 < 0, we're looking for the first 0 bit.
+# if src0 >= 0, we're looking for the first 1 bit.
+unop("ifind_msb", tint32, "(int)util_last_bit_signed(src0) - 1")
 
-unop_convert("find_lsb", tint32, tint, """
-dst = -1;
-for (unsigned bit = 0; bit < bit_size; bit++) {
-   if ((src0 >> bit) & 1) {
-      dst = bit;
-      break;
-   }
-}
-""")
+unop_convert("find_lsb", tint32, tint, "ffsll(src0) - 1")
 
 
 for i in range(1, 5):
@@ -406,43 +404,44 @@ for i in range(1, 5):
 
 
 # AMD_gcn_shader extended instructions
-unop_horiz("cube_face_coord", 2, tfloat32, 3, tfloat32, """
-dst.x = dst.y = 0.0;
+
+# Selects the cube face (0-5 for +X, -X, +Y, -Y, +Z, -Z) of the major axis of
+# src0.  Ties go to the later axis.  If any component is NaN, no face is
+# selected and face is left at -1; cube_face_index returns 0 for those.
+_cube_face_select = """
 float absX = fabs(src0.x);
 float absY = fabs(src0.y);
 float absZ = fabs(src0.z);
 
-float ma = 0.0;
-if (absX >= absY && absX >= absZ) { ma = 2 * src0.x; }
-if (absY >= absX && absY >= absZ) { ma = 2 * src0.y; }
-if (absZ >= absX && absZ >= absY) { ma = 2 * src0.z; }
-
-if (src0.x >= 0 && absX >= absY && absX >= absZ) { dst.x = -src0.z; dst.y = -src0.y; }
-if (src0.x < 0 && absX >= absY && absX >= absZ) { dst.x = src0.z; dst.y = -src0.y; }
-if (src0.y >= 0 && absY >= absX && absY >= absZ) { dst.x = src0.x; dst.y = src0.z; }
-if (src0.y < 0 && absY >= absX && absY >= absZ) { dst.x = src0.x; dst.y = -src0.z; }
-if (src0.z >= 0 && absZ >= absX && absZ >= absY) { dst.x = src0.x; dst.y = -src0.y; }
-if (src0.z < 0 && absZ >= absX && absZ >= absY) { dst.x = -src0.x; dst.y = -src0.y; }
+int face = -1;
+if (absZ >= absX && absZ >= absY) face = src0.z >= 0 ? 4 : 5;
+else if (absY >= absX && absY >= absZ) face = src0.y >= 0 ? 2 : 3;
+else if (absX >= absY && absX >= absZ) face = src0.x >= 0 ? 0 : 1;
+"""
+
+unop_horiz("cube_face_coord", 2, tfloat32, 3, tfloat32, _cube_face_select + """
+float ma;
+switch (face) {
+case 0: dst.x = -src0.z; dst.y = -src0.y; ma = 2 * src0.x; break;
+case 1: dst.x = src0.z; dst.y = -src0.y; ma = 2 * src0.x; break;
+case 2: dst.x = src0.x; dst.y = src0.z; ma = 2 * src0.y; break;
+case 3: dst.x = src0.x; dst.y = -src0.z; ma = 2 * src0.y; break;
+case 4: dst.x = src0.x; dst.y = -src0.y; ma = 2 * src0.z; break;
+case 5: dst.x = -src0.x; dst.y = -src0.y; ma = 2 * src0.z; break;
+default: dst.x = dst.y = 0.0; ma = 0.0; break;
+}
 
 dst.x = dst.x / ma + 0.5;
 dst.y = dst.y / ma + 0.5;
 """)
 
-unop_horiz("cube_face_index", 1, tfloat32, 3, tfloat32, """
-float absX = fabs(src0.x);
-float absY = fabs(src0.y);
-float absZ = fabs(src0.z);
-if (src0.x >= 0 && absX >= absY && absX >= absZ) dst.x = 0;
-if (src0.x < 0 && absX >= absY && absX >= absZ) dst.x = 1;
-if (src0.y >= 0 && absY >= absX && absY >= absZ) dst.x = 2;
-if (src0.y < 0 && absY >= absX && absY >= absZ) dst.x = 3;
-if (src0.z >= 0 && absZ >= absX && absZ >= absY) dst.x = 4;
-if (src0.z < 0 && absZ >= absX && absZ >= absY) dst.x = 5;
+unop_horiz("cube_face_index", 1, tfloat32, 3, tfloat32, _cube_face_select + """
+dst.x = face >= 0 ? face : 0;
 """)
 
 
 def binop_convert(name, out_type, in_type, alg_props, const_expr):
-   opcode(name, 0, out_type, [0, 0], [in_type, in_type],
+   opcode(name, 0, out_type, (0, 0), (in_type, in_type),
           False, alg_props, const_expr)
 
 def binop(name, ty, alg_props, const_expr):
@@ -456,30 +455,17 @@ def binop_compare32(name, ty, alg_props, const_expr):
 
 def binop_horiz(name, out_size, out_type, src1_size, src1_type, src2_size,
                 src2_type, const_expr):
-   opcode(name, out_size, out_type, [src1_size, src2_size], [src1_type, src2_type],
+   opcode(name, out_size, out_type, (src1_size, src2_size), (src1_type, src2_type),
           False, "", const_expr)
 
 def binop_reduce(name, output_size, output_type, src_type, prereduce_expr,
                  reduce_expr, final_expr):
-   def final(src):
-      return final_expr.format(src= "(" + src + ")")
-   def reduce_(src0, src1):
-      return reduce_expr.format(src0=src0, src1=src1)
-   def prereduce(src0, src1):
-      return "(" + prereduce_expr.format(src0=src0, src1=src1) + ")"
-   src0 = prereduce("src0.x", "src1.x")
-   src1 = prereduce("src0.y", "src1.y")
-   src2 = prereduce("src0.z", "src1.z")
-   src3 = prereduce("src0.w", "src1.w")
-   opcode(name + "2", output_size, output_type,
-          [2, 2], [src_type, src_type], False, _2src_commutative,
-          final(reduce_(src0, src1)))
-   opcode(name + "3", output_size, output_type,
-          [3, 3], [src_type, src_type], False, _2src_commutative,
-          final(reduce_(reduce_(src0, src1), src2)))
-   opcode(name + "4", output_size, output_type,
-          [4, 4], [src_type, src_type], False, _2src_commutative,
-          final(reduce_(reduce_(src0, src1), reduce_(src2, src3))))
+   prereduce = ("(" + prereduce_expr + ")").format
+   srcs = [prereduce(src0="src0." + c, src1="src1." + c) for c in "xyzw"]
+   for size, const_expr in _reduce_exprs(srcs, reduce_expr, final_expr):
+      opcode(name + str(size), output_size, output_type,
+             (size, size), (src_type, src_type), False, _2src_commutative,
+             const_expr)
 
 binop("fadd", tfloat, _2src_commutative + associative, "src0 + src1")
 binop("iadd", tint, _2src_commutative + associative, "src0 + src1")
@@ -513,6 +499,9 @@ binop_convert("umul_2x32_64", tuint64, tuint32, _2src_commutative,
 # high 32-bits of signed integer multiply
 binop("imul_high", tint, _2src_commutative, """
 if (bit_size == 64) {
+#if defined(__SIZEOF_INT128__)
+   dst = ((__int128)src0 * (__int128)src1) >> 64;
+#else
    /* We need to do a full 128-bit x 128-bit multiply in order for the sign
     * extension to work properly.  The casts are kind-of annoying but needed
     * to prevent compiler warnings.
@@ -532,6 +521,7 @@ if (bit_size == 64) {
    uint32_t prod_u32[4];
    ubm_mul_u32arr(prod_u32, src0_u32, src1_u32);
    dst = (uint64_t)prod_u32[2] | ((uint64_t)prod_u32[3] << 32);
+#endif
 } else {
    dst = ((int64_t)src0 * (int64_t)src1) >> bit_size;
 }
@@ -540,12 +530,16 @@ if (bit_size == 64) {
 # high 32-bits of unsigned integer multiply
 binop("umul_high", tuint, _2src_commutative, """
 if (bit_size == 64) {
+#if defined(__SIZEOF_INT128__)
+   dst = ((unsigned __int128)src0 * (unsigned __int128)src1) >> 64;
+#else
    /* The casts are kind-of annoying but needed to prevent compiler warnings. */
    uint32_t src0_u32[2] = { src0, (uint64_t)src0 >> 32 };
    uint32_t src1_u32[2] = { src1, (uint64_t)src1 >> 32 };
    uint32_t prod_u32[4];
    ubm_mul_u32arr(prod_u32, src0_u32, src1_u32);
    dst = (uint64_t)prod_u32[2] | ((uint64_t)prod_u32[3] << 32);
+#endif
 } else {
    dst = ((uint64_t)src0 * (uint64_t)src1) >> bit_size;
 }
@@ -681,19 +675,19 @@ binop("sne", tfloat32, _2src_commutative, "(src0 != src1) ? 1.0f : 0.0f") # Set
 # SPIRV shifts are undefined for shift-operands >= bitsize,
 # but SM5 shifts are defined to use the least significant bits, only
 # The NIR definition is according to the SM5 specification.
-opcode("ishl", 0, tint, [0, 0], [tint, tuint32], False, "",
+opcode("ishl", 0, tint, (0, 0), (tint, tuint32), False, "",
        "src0 << (src1 & (sizeof(src0) * 8 - 1))")
-opcode("ishr", 0, tint, [0, 0], [tint, tuint32], False, "",
+opcode("ishr", 0, tint, (0, 0), (tint, tuint32), False, "",
        "src0 >> (src1 & (sizeof(src0) * 8 - 1))")
-opcode("ushr", 0, tuint, [0, 0], [tuint, tuint32], False, "",
+opcode("ushr", 0, tuint, (0, 0), (tuint, tuint32), False, "",
        "src0 >> (src1 & (sizeof(src0) * 8 - 1))")
 
-opcode("urol", 0, tuint, [0, 0], [tuint, tuint32], False, "", """
+opcode("urol", 0, tuint, (0, 0), (tuint, tuint32), False, "", """
    uint32_t rotate_mask = sizeof(src0) * 8 - 1;
    dst = (src0 << (src1 & rotate_mask)) |
          (src0 >> (-src1 & rotate_mask));
 """)
-opcode("uror", 0, tuint, [0, 0], [tuint, tuint32], False, "", """
+opcode("uror", 0, tuint, (0, 0), (tuint, tuint32), False, "", """
    uint32_t rotate_mask = sizeof(src0) * 8 - 1;
    dst = (src0 >> (src1 & rotate_mask)) |
          (src0 << (-src1 & rotate_mask));
@@ -716,51 +710,56 @@ binop_reduce("fdot", 1, tfloat, tfloat, "{src0} * {src1}", "{src0} + {src1}",
 binop_reduce("fdot_replicated", 4, tfloat, tfloat,
              "{src0} * {src1}", "{src0} + {src1}", "{src}")
 
-opcode("fdph", 1, tfloat, [3, 4], [tfloat, tfloat], False, "",
+opcode("fdph", 1, tfloat, (3, 4), (tfloat, tfloat), False, "",
        "src0.x * src1.x + src0.y * src1.y + src0.z * src1.z + src1.w")
-opcode("fdph_replicated", 4, tfloat, [3, 4], [tfloat, tfloat], False, "",
+opcode("fdph_replicated", 4, tfloat, (3, 4), (tfloat, tfloat), False, "",
        "src0.x * src1.x + src0.y * src1.y + src0.z * src1.z + src1.w")
 
-binop("fmin", tfloat, "", "fminf(src0, src1)")
+binop("fmin", tfloat, "", _float_call("fmin", "src0, src1"))
 binop("imin", tint, _2src_commutative + associative, "src1 > src0 ? src0 : src1")
 binop("umin", tuint, _2src_commutative + associative, "src1 > src0 ? src0 : src1")
-binop("fmax", tfloat, "", "fmaxf(src0, src1)")
+binop("fmax", tfloat, "", _float_call("fmax", "src0, src1"))
 binop("imax", tint, _2src_commutative + associative, "src1 > src0 ? src1 : src0")
 binop("umax", tuint, _2src_commutative + associative, "src1 > src0 ? src1 : src0")
 
+# The 4x8 opcodes below work on all four bytes at once (SWAR).  Adding or
+# subtracting only the low 7 bits of each byte can't carry into the next
+# byte, and the carry or borrow out of bit 7 is then recovered per byte.
+
 # Saturated vector add for 4 8bit ints.
 binop("usadd_4x8", tint32, _2src_commutative + associative, """
-dst = 0;
-for (int i = 0; i < 32; i += 8) {
-   dst |= MIN2(((src0 >> i) & 0xff) + ((src1 >> i) & 0xff), 0xff) << i;
-}
+uint32_t a = src0, b = src1;
+uint32_t sum = (a & 0x7f7f7f7f) + (b & 0x7f7f7f7f);
+uint32_t carry = ((a & b) | ((a ^ b) & sum)) & 0x80808080;
+sum ^= (a ^ b) & 0x80808080;
+dst = sum | ((carry >> 7) * 0xff);
 """)
 
 # Saturated vector subtract for 4 8bit ints.
 binop("ussub_4x8", tint32, "", """
-dst = 0;
-for (int i = 0; i < 32; i += 8) {
-   int src0_chan = (src0 >> i) & 0xff;
-   int src1_chan = (src1 >> i) & 0xff;
-   if (src0_chan > src1_chan)
-      dst |= (src0_chan - src1_chan) << i;
-}
+uint32_t a = src0, b = src1;
+uint32_t diff = (a | 0x80808080) - (b & 0x7f7f7f7f);
+uint32_t borrow = ((~a & b) | (~(a ^ b) & ~diff)) & 0x80808080;
+diff ^= ~(a ^ b) & 0x80808080;
+dst = diff & ~((borrow >> 7) * 0xff);
 """)
 
 # vector min for 4 8bit ints.
 binop("umin_4x8", tint32, _2src_commutative + associative, """
-dst = 0;
-for (int i = 0; i < 32; i += 8) {
-   dst |= MIN2((src0 >> i) & 0xff, (src1 >> i) & 0xff) << i;
-}
+uint32_t a = src0, b = src1;
+uint32_t diff = (a | 0x80808080) - (b & 0x7f7f7f7f);
+uint32_t borrow = ((~a & b) | (~(a ^ b) & ~diff)) & 0x80808080;
+uint32_t a_smaller = (borrow >> 7) * 0xff;
+dst = (a & a_smaller) | (b & ~a_smaller);
 """)
 
 # vector max for 4 8bit ints.
 binop("umax_4x8", tint32, _2src_commutative + associative, """
-dst = 0;
-for (int i = 0; i < 32; i += 8) {
-   dst |= MAX2((src0 >> i) & 0xff, (src1 >> i) & 0xff) << i;
-}
+uint32_t a = src0, b = src1;
+uint32_t diff = (a | 0x80808080) - (b & 0x7f7f7f7f);
+uint32_t borrow = ((~a & b) | (~(a ^ b) & ~diff)) & 0x80808080;
+uint32_t a_smaller = (borrow >> 7) * 0xff;
+dst = (b & a_smaller) | (a & ~a_smaller);
 """)
 
 # unorm multiply: (a * b) / 255.
@@ -773,7 +772,7 @@ for (int i = 0; i < 32; i += 8) {
 }
 """)
 
-binop("fpow", tfloat, "", "bit_size == 64 ? powf(src0, src1) : pow(src0, src1)")
+binop("fpow", tfloat, "", _float_call("pow", "src0, src1"))
 
 binop_horiz("pack_half_2x16_split", 1, tuint32, 1, tfloat32, 1, tfloat32,
             "pack_half_1x16(src0.x) | (pack_half_1x16(src1.x) << 16)")
@@ -793,8 +792,8 @@ int offset = src1 & 0x1F;
 dst = ((1u << bits) - 1) << offset;
 """)
 
-opcode("ldexp", 0, tfloat, [0, 0], [tfloat, tint32], False, "", """
-dst = (bit_size == 64) ? ldexp(src0, src1) : ldexpf(src0, src1);
+opcode("ldexp", 0, tfloat, (0, 0), (tfloat, tint32), False, "", """
+dst = """ + _float_call("ldexp", "src0, src1") + """;
 /* flush denormals to zero. */
 if (!isnormal(dst))
    dst = copysignf(0.0f, src0);
@@ -817,11 +816,11 @@ binop("extract_i16", tint, "", "(int16_t)(src0 >> (src1 * 16))")
 
 
 def triop(name, ty, alg_props, const_expr):
-   opcode(name, 0, ty, [0, 0, 0], [ty, ty, ty], False, alg_props, const_expr)
+   opcode(name, 0, ty, (0, 0, 0), (ty, ty, ty), False, alg_props, const_expr)
 def triop_horiz(name, output_size, src1_size, src2_size, src3_size, const_expr):
    opcode(name, output_size, tuint,
-   [src1_size, src2_size, src3_size],
-   [tuint, tuint, tuint], False, "", const_expr)
+   (src1_size, src2_size, src3_size),
+   (tuint, tuint, tuint), False, "", const_expr)
 
 triop("ffma", tfloat, _2src_commutative, "src0 * src1 + src2")
 
@@ -837,22 +836,24 @@ triop("flrp", tfloat, "", "src0 * (1 - src2) + src1 * src2")
 triop("fcsel", tfloat32, "", "(src0 != 0.0f) ? src1 : src2")
 
 # 3 way min/max/med
-triop("fmin3", tfloat, "", "fminf(src0, fminf(src1, src2))")
+triop("fmin3", tfloat, "", "bit_size == 64 ? fmin(src0, fmin(src1, src2)) : fminf(src0, fminf(src1, src2))")
 triop("imin3", tint, "", "MIN2(src0, MIN2(src1, src2))")
 triop("umin3", tuint, "", "MIN2(src0, MIN2(src1, src2))")
 
-triop("fmax3", tfloat, "", "fmaxf(src0, fmaxf(src1, src2))")
+triop("fmax3", tfloat, "", "bit_size == 64 ? fmax(src0, fmax(src1, src2)) : fmaxf(src0, fmaxf(src1, src2))")
 triop("imax3", tint, "", "MAX2(src0, MAX2(src1, src2))")
 triop("umax3", tuint, "", "MAX2(src0, MAX2(src1, src2))")
 
-triop("fmed3", tfloat, "", "fmaxf(fminf(fmaxf(src0, src1), src2), fminf(src0, src1))")
+triop("fmed3", tfloat, "", ("bit_size == 64 ? " +
+                           "fmax(fmin(fmax(src0, src1), src2), fmin(src0, src1)) : " +
+                           "fmaxf(fminf(fmaxf(src0, src1), src2), fminf(src0, src1))"))
 triop("imed3", tint, "", "MAX2(MIN2(MAX2(src0, src1), src2), MIN2(src0, src1))")
 triop("umed3", tuint, "", "MAX2(MIN2(MAX2(src0, src1), src2), MIN2(src0, src1))")
 
-opcode("bcsel", 0, tuint, [0, 0, 0],
-      [tbool1, tuint, tuint], False, "", "src0 ? src1 : src2")
-opcode("b32csel", 0, tuint, [0, 0, 0],
-       [tbool32, tuint, tuint], False, "", "src0 ? src1 : src2")
+opcode("bcsel", 0, tuint, (0, 0, 0),
+      (tbool1, tuint, tuint), False, "", "src0 ? src1 : src2")
+opcode("b32csel", 0, tuint, (0, 0, 0),
+       (tbool32, tuint, tuint), False, "", "src0 ? src1 : src2")
 
 # SM5 bfi assembly
 triop("bfi", tuint32, "", """
@@ -860,34 +861,27 @@ unsigned mask = src0, insert = src1, base = src2;
 if (mask == 0) {
    dst = base;
 } else {
-   unsigned tmp = mask;
-   while (!(tmp & 1)) {
-      tmp >>= 1;
-      insert <<= 1;
-   }
+   insert <<= ffs(mask) - 1;
    dst = (base & ~mask) | (insert & mask);
 }
 """)
 
 
-triop("bitfield_select", tuint, "", "(src0 & src1) | (~src0 & src2)")
+triop("bitfield_select", tuint, "", "src2 ^ ((src2 ^ src1) & src0)")
 
 # SM5 ubfe/ibfe assembly: only the 5 least significant bits of offset and bits are used.
 opcode("ubfe", 0, tuint32,
-       [0, 0, 0], [tuint32, tuint32, tuint32], False, "", """
+       (0, 0, 0), (tuint32, tuint32, tuint32), False, "", """
 unsigned base = src0;
 unsigned offset = src1 & 0x1F;
 unsigned bits = src2 & 0x1F;
-if (bits == 0) {
-   dst = 0;
-} else if (offset + bits < 32) {
-   dst = (base << (32 - bits - offset)) >> (32 - bits);
-} else {
-   dst = base >> offset;
-}
+/* Also right for bits == 0 and for fields that run past bit 31, since
+ * bits < 32 and the shift brings in zeros from the top.
+ */
+dst = (base >> offset) & ((1u << bits) - 1);
 """)
 opcode("ibfe", 0, tint32,
-       [0, 0, 0], [tint32, tuint32, tuint32], False, "", """
+       (0, 0, 0), (tint32, tuint32, tuint32), False, "", """
 int base = src0;
 unsigned offset = src1 & 0x1F;
 unsigned bits = src2 & 0x1F;
@@ -902,27 +896,25 @@ if (bits == 0) {
 
 # GLSL bitfieldExtract()
 opcode("ubitfield_extract", 0, tuint32,
-       [0, 0, 0], [tuint32, tint32, tint32], False, "", """
+       (0, 0, 0), (tuint32, tint32, tint32), False, "", """
 unsigned base = src0;
 int offset = src1, bits = src2;
-if (bits == 0) {
+/* bits == 0 gives 0, the other cases are undefined per the spec. */
+if (bits <= 0 || offset < 0 || bits > 32 - offset) {
    dst = 0;
-} else if (bits < 0 || offset < 0 || offset + bits > 32) {
-   dst = 0; /* undefined per the spec */
 } else {
    dst = (base >> offset) & ((1ull << bits) - 1);
 }
 """)
 opcode("ibitfield_extract", 0, tint32,
-       [0, 0, 0], [tint32, tint32, tint32], False, "", """
+       (0, 0, 0), (tint32, tint32, tint32), False, "", """
 int base = src0;
 int offset = src1, bits = src2;
-if (bits == 0) {
-   dst = 0;
-} else if (offset < 0 || bits < 0 || offset + bits > 32) {
+/* bits == 0 gives 0, the other cases are undefined per the spec. */
+if (bits <= 0 || offset < 0 || bits > 32 - offset) {
    dst = 0;
 } else {
-   dst = (base << (32 - offset - bits)) >> offset; /* use sign-extending shift */
+   dst = (base << (32 - offset - bits)) >> (32 - bits); /* use sign-extending shift */
 }
 """)
 
@@ -937,17 +929,17 @@ dst.z = src2.x;
 def quadop_horiz(name, output_size, src1_size, src2_size, src3_size,
                  src4_size, const_expr):
    opcode(name, output_size, tuint,
-          [src1_size, src2_size, src3_size, src4_size],
-          [tuint, tuint, tuint, tuint],
+          (src1_size, src2_size, src3_size, src4_size),
+          (tuint, tuint, tuint, tuint),
           False, "", const_expr)
 
-opcode("bitfield_insert", 0, tuint32, [0, 0, 0, 0],
-       [tuint32, tuint32, tint32, tint32], False, "", """
+opcode("bitfield_insert", 0, tuint32, (0, 0, 0, 0),
+       (tuint32, tuint32, tint32, tint32), False, "", """
 unsigned base = src0, insert = src1;
 int offset = src2, bits = src3;
 if (bits == 0) {
    dst = base;
-} else if (offset < 0 || bits < 0 || bits + offset > 32) {
+} else if (offset < 0 || bits < 0 || bits > 32 - offset) {
    dst = 0;
 } else {
    unsigned mask = ((1ull << bits) - 1) << offset;
@@ -966,6 +958,6 @@ dst.w = src3.x;
 # (IMADSH_MIX16 i.e. ah * bl << 16 + c). It is used for lowering integer
 # multiplication (imul) on Freedreno backend..
 opcode("imadsh_mix16", 1, tint32,
-       [1, 1, 1], [tint32, tint32, tint32], False, "", """
+       (1, 1, 1), (tint32, tint32, tint32), False, "", """
 dst.x = ((((src0.x & 0xffff0000) >> 16) * (src1.x & 0x0000ffff)) << 16) + src2.x;
 """)